@@ -10,6 +10,7 @@
 const CONFIG = {
   NEWS_API_URL:    '/api/news',       // Flask proxy route
   SUMMARIZE_URL:   '/api/summarize',  // Flask proxy route
+  STREAM_URL:      '/api/summarize/stream',  // SSE variant
   DEFAULT_TOPIC:   'technology',
   PAGE_SIZE:       12,
 };
@@ -230,6 +231,7 @@ class GeminiClient {
     this.endpoint = CONFIG.SUMMARIZE_URL;  // Flask proxy — key in .env
   }
 
+  // Non-streaming fallback for browsers without EventSource
   async summarize(title, description, url) {
     const response = await fetch(this.endpoint, {
       method:  'POST',
@@ -245,6 +247,38 @@ class GeminiClient {
     const data = await response.json();
     return data.summary;
   }
+
+  // Stream the summary over Server-Sent Events — onDelta receives
+  // each text chunk as Gemini writes it; resolves with the full text
+  summarizeStream(title, description, url, onDelta) {
+    const params = new URLSearchParams({ title, description, url });
+
+    return new Promise((resolve, reject) => {
+      const source = new EventSource(`${CONFIG.STREAM_URL}?${params}`);
+      let summary  = '';
+
+      source.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+
+        if (data.error) {
+          source.close();
+          reject(new Error(data.error));
+        } else if (data.done) {
+          source.close();
+          resolve(summary.trim());
+        } else if (data.delta) {
+          summary += data.delta;
+          onDelta(summary);
+        }
+      };
+
+      // Fired on network drops — stop EventSource auto-reconnecting
+      source.onerror = () => {
+        source.close();
+        reject(new Error('Lost connection while generating summary'));
+      };
+    });
+  }
 }
 
 // ═══════════════════════════════════════════════
@@ -329,17 +363,28 @@ class NewsApp {
         this.openModal(title);
 
         try {
-          const summary = await this.gemini.summarize(title, description, url);
-
-          // Render summary text into modal body
-          const modalBody = document.getElementById('modal-body');
-          modalBody.innerHTML = '';
-
-          const p       = document.createElement('p');
-          p.id          = 'summary-text';
-          p.className   = 'summary-text';
-          p.textContent = summary;
-          modalBody.appendChild(p);
+          let p = null;
+
+          // Replace the spinner on the first chunk, then grow the text in place
+          const render = (summary) => {
+            if (!p) {
+              const modalBody = document.getElementById('modal-body');
+              modalBody.innerHTML = '';
+
+              p           = document.createElement('p');
+              p.id        = 'summary-text';
+              p.className = 'summary-text';
+              modalBody.appendChild(p);
+            }
+            p.textContent = summary;
+          };
+
+          // Stream when the browser supports SSE, else one POST round-trip
+          if ('EventSource' in window) {
+            await this.gemini.summarizeStream(title, description, url, render);
+          } else {
+            render(await this.gemini.summarize(title, description, url));
+          }
 
         } catch (error) {
           document.getElementById('modal-body').innerHTML = `
@@ -0,0 +1,23 @@
+"""
+NewsLens — Gunicorn Config
+Production server for server.py (picked up
+automatically by `gunicorn server:app`).
+gevent workers yield while waiting on NewsAPI
+and Gemini, so slow upstream calls overlap
+instead of blocking the whole process.
+"""
+
+import multiprocessing
+import os
+
+bind               = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers            = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class       = "gevent"
+worker_connections = 200   # concurrent requests per worker
+timeout            = 30
+
+# This file runs in the master before workers fork, so every worker
+# inherits this default; a value already set in the environment wins.
+# One worker per core already saturates the CPU — keep embedding
+# inference single-threaded inside each worker by default.
+os.environ.setdefault("EMBED_NUM_THREADS", "1")
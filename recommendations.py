@@ -1,26 +1,439 @@
 """
 NewsLens — Recommendations Microservice
-Stores article embeddings in ChromaDB vector store.
-Given any article, finds semantically similar ones
-using sentence-transformer cosine similarity search.
+Keeps article embeddings in an in-memory numpy index
+(persisted to a ChromaDB vector store). Given any
+article, finds semantically similar ones using
+sentence-transformer cosine similarity search.
 """
 
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
 from typing import Any, Mapping
-from sentence_transformers import SentenceTransformer  # type: ignore
-import chromadb
+
+import numpy as np
+
+# onnxruntime, transformers and chromadb are imported inside
+# get_model() / get_collection(), so importing this module is cheap
 
 # ── CONFIG ────────────────────────────────────
 COLLECTION_NAME = "news_articles"
+CHROMA_PATH     = os.getenv("CHROMA_PATH", "./chroma_db")
+USE_CHROMA      = os.getenv("USE_CHROMA", "1") == "1"  # persist to disk
 MODEL_NAME      = "all-MiniLM-L6-v2"  # 80MB, fast, free
+HF_MODEL_ID     = f"sentence-transformers/{MODEL_NAME}"
+ONNX_DIR        = os.getenv("ONNX_MODEL_DIR", "./onnx_model")
+ONNX_FILE       = "model_quantized.onnx"  # int8 dynamic-quantized export
+NUM_THREADS     = int(os.getenv("EMBED_NUM_THREADS", "0"))  # 0 = one per core
+EMBEDDING_DIM   = 384                  # output size of MODEL_NAME
+MAX_SEQ_LENGTH  = 128                  # title + description fit; attention is O(L²)
+BATCH_SIZE      = 32                   # small batches keep per-batch padding low
 TOP_K           = 5                    # recommendations to return
+CACHE_SIZE      = 512                  # cached queries (LRU)
+CACHE_THRESHOLD = 0.95                 # cosine similarity for a semantic hit
+SCORE_CHUNK     = 16384                # index rows widened to float32 at a time
+
+
+# ═══════════════════════════════════════════════
+# ONNX EMBEDDER
+# Drop-in replacement for SentenceTransformer:
+# tokenize → int8 ONNX graph → mean-pool → L2 norm
+# ═══════════════════════════════════════════════
+def export_quantized_model(onnx_dir: str = ONNX_DIR) -> None:
+    """
+    One-time export of MODEL_NAME to ONNX, followed by
+    int8 dynamic quantization of its weights.
+    Writes the tokenizer and ONNX_FILE into onnx_dir.
+    """
+    # Heavy export-only dependencies, only needed the first time
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+    from transformers import AutoModel, AutoTokenizer  # type: ignore
+
+    os.makedirs(onnx_dir, exist_ok=True)
+
+    # Build everything in a private scratch dir, then move files in with
+    # atomic os.replace — ONNX_FILE last, since its presence means "ready".
+    # Concurrent exports (one per Gunicorn worker) can then never leave a
+    # truncated file behind; the last identical copy simply wins.
+    scratch = tempfile.mkdtemp(prefix=".export-", dir=onnx_dir)
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_ID, use_fast=True)
+        hf_model  = AutoModel.from_pretrained(HF_MODEL_ID, torchscript=True).eval()
+        dummy     = tokenizer(["export"], return_tensors="pt")
+
+        input_names = ["input_ids", "attention_mask", "token_type_ids"]
+        fp32_path   = os.path.join(scratch, "model.onnx")
+
+        torch.onnx.export(
+            hf_model,
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names   = input_names,
+            output_names  = ["last_hidden_state", "pooler_output"],
+            dynamic_axes  = {
+                **{name: {0: "batch", 1: "sequence"} for name in input_names},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+                "pooler_output":     {0: "batch"},
+            },
+            opset_version = 14,
+        )
+
+        quantize_dynamic(
+            fp32_path,
+            os.path.join(scratch, ONNX_FILE),
+            weight_type = QuantType.QInt8,
+        )
+        os.remove(fp32_path)   # only the int8 graph is loaded at runtime
+        tokenizer.save_pretrained(scratch)
+
+        names = sorted(os.listdir(scratch), key=lambda name: name == ONNX_FILE)
+        for name in names:
+            os.replace(os.path.join(scratch, name), os.path.join(onnx_dir, name))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+class OnnxEmbedder:
+    """
+    Sentence embedder backed by ONNX Runtime.
+    Mirrors the SentenceTransformer pipeline for
+    MODEL_NAME (mean pooling + normalization) and
+    returns float32 numpy arrays from encode().
+    """
+
+    def __init__(self, onnx_dir: str = ONNX_DIR) -> None:
+        import onnxruntime as ort  # type: ignore
+        from transformers import AutoTokenizer  # type: ignore
+
+        model_path = os.path.join(onnx_dir, ONNX_FILE)
+        if not os.path.exists(model_path):
+            print(f"Exporting quantized ONNX model to {onnx_dir}...")
+            export_quantized_model(onnx_dir)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = NUM_THREADS
+
+        self.tokenizer   = AutoTokenizer.from_pretrained(onnx_dir, use_fast=True)
+        self.session     = ort.InferenceSession(
+            model_path,
+            sess_options = options,
+            providers    = ["CPUExecutionProvider"],
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def encode(self, sentences: list[str], batch_size: int = BATCH_SIZE) -> np.ndarray:
+        """
+        Embed sentences in batches of batch_size.
+        Returns an array of shape (len(sentences), dim)
+        with every row L2-normalized.
+        """
+        batches: list[np.ndarray] = []
+
+        for start in range(0, len(sentences), batch_size):
+            encoded = self.tokenizer(
+                sentences[start:start + batch_size],
+                padding        = True,
+                truncation     = True,
+                max_length     = MAX_SEQ_LENGTH,
+                return_tensors = "np",
+            )
+            feeds = {
+                name: encoded[name].astype(np.int64)
+                for name in self.input_names
+                if name in encoded
+            }
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean-pool over real tokens only (padding masked out)
+            mask    = encoded["attention_mask"][..., None].astype(np.float32)
+            summed  = (token_embeddings * mask).sum(axis=1)
+            counts  = np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled  = summed / counts
+
+            norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append((pooled / norms).astype(np.float32))
+
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(batches)
 
 
 # ── SETUP ─────────────────────────────────────
-print("Loading embedding model...")
-model      = SentenceTransformer(MODEL_NAME)
-client     = chromadb.Client()
-collection = client.get_or_create_collection(COLLECTION_NAME)
-print("Recommendations microservice ready.\n")
+# Model and Chroma are created on first use, so processes that
+# never serve recommendations don't pay their startup or memory
+_init_lock = threading.Lock()
+_model: OnnxEmbedder | None = None
+_collection: Any = None
+_collection_ready = False
+
+
+def get_model() -> OnnxEmbedder:
+    """The shared embedder, loaded and warmed on first call."""
+    global _model
+
+    if _model is None:
+        with _init_lock:
+            if _model is None:
+                print("Loading embedding model...")
+                embedder = OnnxEmbedder()
+
+                # Dummy batch so session/thread-pool setup and first-run
+                # allocations happen here rather than inside a real request
+                embedder.encode(["warmup text"] * 2)
+                _model = embedder
+    return _model
+
+
+def get_collection() -> Any:
+    """
+    The Chroma collection (None when USE_CHROMA=0).
+    Chroma is only the on-disk copy; the first call
+    also reloads rows persisted by earlier runs into
+    the in-memory index, which queries read instead.
+    """
+    global _collection, _collection_ready
+
+    if not _collection_ready:
+        with _init_lock:
+            if not _collection_ready:
+                if USE_CHROMA:
+                    import chromadb
+
+                    client      = chromadb.PersistentClient(path=CHROMA_PATH)
+                    _collection = client.get_or_create_collection(COLLECTION_NAME)
+                    _load_index(_collection)
+                _collection_ready = True
+    return _collection
+
+
+# ═══════════════════════════════════════════════
+# VECTOR INDEX
+# Every stored embedding is a row of one int8
+# matrix (plus a float32 scale per row), so a
+# search is a brute-force matrix-vector product
+# over 384 B per article instead of 1536 B.
+# ═══════════════════════════════════════════════
+_index_lock = threading.Lock()
+_E: np.ndarray = np.empty((0, EMBEDDING_DIM), dtype=np.int8)
+_scales: np.ndarray = np.empty(0, dtype=np.float32)   # row-aligned with _E
+_meta: list[Mapping[str, Any]] = []                    # row-aligned with _E
+_ids: list[str] = []                                   # row-aligned with _E
+_row_of: dict[str, int] = {}                           # article id → row
+
+
+def _quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-row int8 quantization.
+    Returns (int8 rows, float32 scales) with
+    vectors ≈ rows * scales[:, None].
+    """
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales = np.maximum(scales, np.finfo(np.float32).tiny)   # all-zero rows
+    rows   = np.round(vectors / scales[:, None]).astype(np.int8)
+    return rows, scales.astype(np.float32)
+
+
+def _index_scores(E: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Approximate cosine similarity of query against every row.
+    Int8 products are widened to float32 in SCORE_CHUNK slices
+    so the dot runs through BLAS; sums of 384 int8 × int8
+    products stay below 2**24, so float32 holds them exactly.
+    """
+    q_rows, q_scale = _quantize(query[None, :])
+    q = q_rows[0].astype(np.float32)
+
+    dots = np.empty(len(E), dtype=np.float32)
+    for start in range(0, len(E), SCORE_CHUNK):
+        chunk = E[start:start + SCORE_CHUNK]
+        dots[start:start + len(chunk)] = chunk.astype(np.float32) @ q
+
+    return dots * scales * q_scale[0]
+
+
+def _top_k(
+    E: np.ndarray,
+    scales: np.ndarray,
+    query: np.ndarray,
+    k: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Rows of the k best matches and their scores, best first."""
+    scores = _index_scores(E, scales, query)
+    top    = np.argpartition(-scores, k - 1)[:k]
+    top    = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+
+def _index_upsert(
+    ids: list[str],
+    embeddings: np.ndarray,
+    metadatas: list[Mapping[str, Any]],
+) -> None:
+    """
+    Insert or overwrite rows by article id. Builds new
+    arrays and swaps them in, so concurrent readers keep
+    a consistent snapshot.
+    """
+    global _E, _scales, _meta, _ids
+
+    with _index_lock:
+        rows: list[int] = []
+        for doc_id in ids:
+            row = _row_of.get(doc_id)
+            if row is None:
+                row = _row_of[doc_id] = len(_row_of)
+            rows.append(row)
+
+        quantized, row_scales = _quantize(embeddings)
+
+        E = np.empty((len(_row_of), EMBEDDING_DIM), dtype=np.int8)
+        E[:len(_E)] = _E
+        E[rows]     = quantized
+
+        scales = np.empty(len(_row_of), dtype=np.float32)
+        scales[:len(_scales)] = _scales
+        scales[rows]          = row_scales
+
+        meta = _meta + [{}] * (len(_row_of) - len(_meta))
+        for row, metadata in zip(rows, metadatas):
+            meta[row] = metadata
+
+        ids_by_row = _ids + list(_row_of)[len(_ids):]   # new rows were appended
+
+        _E, _scales, _meta, _ids = E, scales, meta, ids_by_row
+
+
+def _index_has(doc_id: str, text_hash: str) -> bool:
+    """True if doc_id is already indexed with exactly this text."""
+    with _index_lock:
+        row = _row_of.get(doc_id)
+        return row is not None and _meta[row].get("text_hash") == text_hash
+
+
+def _index_snapshot() -> tuple[np.ndarray, np.ndarray, list[Mapping[str, Any]], list[str]]:
+    """Current (matrix, scales, metadata, ids), read under the lock."""
+    with _index_lock:
+        return _E, _scales, _meta, _ids
+
+
+def _load_index(collection: Any) -> None:
+    """Fill the index with every row persisted in collection."""
+    if not collection.count():
+        return
+
+    stored = collection.get(include=["embeddings", "metadatas"])
+    _index_upsert(
+        stored["ids"],
+        np.asarray(stored["embeddings"], dtype=np.float32),
+        [dict(m or {}) for m in stored["metadatas"] or []],
+    )
+
+
+# ═══════════════════════════════════════════════
+# QUERY CACHE
+# Exact match on (query, top_k), then semantic
+# match on the query embedding (cosine >= 0.95).
+# Cleared whenever new articles are stored.
+# ═══════════════════════════════════════════════
+CacheKey = tuple[str, int]
+
+_cache_lock = threading.Lock()
+_query_cache: "OrderedDict[CacheKey, tuple[np.ndarray, list[dict[str, Any]]]]" = OrderedDict()
+_cache_keys: list[CacheKey] = []          # row order of _cache_embs
+_cache_embs: np.ndarray | None = None     # (N, dim) L2-normalized, rebuilt lazily
+_cache_generation = 0                     # bumped by every clear_query_cache()
+
+
+def cache_generation() -> int:
+    """Current cache generation; read it before taking an index snapshot."""
+    with _cache_lock:
+        return _cache_generation
+
+
+def _cache_get_exact(key: CacheKey) -> list[dict[str, Any]] | None:
+    """Return cached results for an identical query, refreshing its LRU slot."""
+    with _cache_lock:
+        entry = _query_cache.get(key)
+        if entry is None:
+            return None
+        _query_cache.move_to_end(key)
+        return [dict(rec) for rec in entry[1]]
+
+
+def _cache_get_similar(
+    embedding: np.ndarray,
+    top_k: int,
+) -> tuple[np.ndarray, list[dict[str, Any]]] | None:
+    """
+    Return (matched entry's embedding, results) for a
+    near-identical query embedding, or None.
+    """
+    global _cache_keys, _cache_embs
+
+    with _cache_lock:
+        if not _query_cache:
+            return None
+
+        if _cache_embs is None:
+            _cache_keys = list(_query_cache)
+            _cache_embs = np.stack([_query_cache[k][0] for k in _cache_keys])
+
+        # Rows are normalized, so the dot product is the cosine similarity
+        sims = _cache_embs @ embedding
+        for row in np.argsort(-sims):
+            if sims[row] < CACHE_THRESHOLD:
+                break
+            key = _cache_keys[row]
+            if key[1] == top_k:
+                _query_cache.move_to_end(key)
+                matched_embedding, results = _query_cache[key]
+                return matched_embedding, [dict(rec) for rec in results]
+
+    return None
+
+
+def _cache_put(
+    key: CacheKey,
+    embedding: np.ndarray,
+    results: list[dict[str, Any]],
+    generation: int,
+) -> None:
+    """
+    Store results for a query, evicting the least recently
+    used entry. Skipped if the cache was cleared since
+    `generation` was read — the results may be stale.
+    """
+    global _cache_embs
+
+    with _cache_lock:
+        if generation != _cache_generation:
+            return
+
+        _query_cache[key] = (embedding, [dict(rec) for rec in results])
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > CACHE_SIZE:
+            _query_cache.popitem(last=False)
+        _cache_embs = None
+
+
+def clear_query_cache() -> None:
+    """Drop every cached query (called after the article store changes)."""
+    global _cache_embs, _cache_generation
+
+    with _cache_lock:
+        _cache_generation += 1
+        _query_cache.clear()
+        _cache_embs = None
+
+
+def article_id(article: Mapping[str, Any]) -> str:
+    """Stable id for an article, so re-storing it updates the same row."""
+    key = f"{article.get('title', '')}{article.get('url', '')}"
+    return hashlib.sha1(key.encode()).hexdigest()
 
 
 # ═══════════════════════════════════════════════
@@ -30,59 +443,102 @@ print("Recommendations microservice ready.\n")
 # ═══════════════════════════════════════════════
 def store_articles(articles: list[dict[str, Any]]) -> None:
     """
-    Embed and store a list of article dicts in ChromaDB.
-    Each article is converted to a vector from its
-    title + description text combined.
+    Embed and store a list of article dicts in the
+    vector index (and ChromaDB, if enabled). Each
+    article is converted to a vector from its
+    title + description text combined. Articles are
+    upserted by article_id; ones already stored with
+    the same text are skipped, and identical texts
+    (e.g. wire copies) are only encoded once.
     """
     if not articles:
         return
 
+    collection = get_collection()   # also loads persisted rows first
+
     ids: list[str] = []
+    seen_ids: set[str] = set()
     documents: list[str] = []
+    text_hashes: list[str] = []
     # Explicitly type as Mapping to satisfy Mypy's strict invariance
     metadatas: list[Mapping[str, str | int | float | bool]] = []
 
-    for i, article in enumerate(articles):
+    for article in articles:
         text = (
             f"{article.get('title', '')} "
             f"{article.get('description', '')}"
         ).strip()
 
-        if not text:
+        # Upsert rejects repeated ids within one call — keep the first copy
+        doc_id = article_id(article)
+        if not text or doc_id in seen_ids:
+            continue
+
+        # Already stored with identical text — nothing to re-embed
+        text_hash = hashlib.sha1(text.encode()).hexdigest()
+        if _index_has(doc_id, text_hash):
             continue
 
-        ids.append(str(i))
+        seen_ids.add(doc_id)
+        ids.append(doc_id)
         documents.append(text)
+        text_hashes.append(text_hash)
 
         # Safely extract source name
         source = article.get("source")
         source_name = source.get("name", "Unknown") if isinstance(source, dict) else "Unknown"
 
         metadatas.append({
-            "title":  str(article.get("title", "")),
-            "url":    str(article.get("url", "")),
-            "source": str(source_name),
+            "title":     str(article.get("title", "")),
+            "url":       str(article.get("url", "")),
+            "source":    str(source_name),
+            "text_hash": text_hash,
         })
 
     if not ids:
         return
 
-    # Encode all documents in one batch (faster than one by one)
-    embeddings = model.encode(documents).tolist()
+    # Encode each distinct text once; source_of maps documents → to_encode
+    unique_of: dict[str, int] = {}
+    to_encode: list[str] = []
+    source_of: list[int] = []
+    for text, text_hash in zip(documents, text_hashes):
+        if text_hash not in unique_of:
+            unique_of[text_hash] = len(to_encode)
+            to_encode.append(text)
+        source_of.append(unique_of[text_hash])
 
-    collection.add(
-        ids        = ids,
-        documents  = documents,
-        embeddings = embeddings,
-        metadatas  = metadatas,
-    )
+    # Encode shortest-to-longest so each batch pads to similar lengths,
+    # then scatter the rows back and expand duplicates to every document
+    order       = sorted(range(len(to_encode)), key=lambda i: len(to_encode[i]))
+    sorted_embs = get_model().encode([to_encode[i] for i in order], batch_size=BATCH_SIZE)
+
+    unique_embs = np.empty_like(sorted_embs)
+    unique_embs[order] = sorted_embs
+    embeddings  = unique_embs[source_of]
+
+    # Persist first: rows only enter the index (and so get skipped by
+    # _index_has next time) once Chroma holds them. Embeddings stay numpy
+    # everywhere except this write — the pinned chromadb 0.4.x rejects
+    # ndarrays, so lists are built once per store
+    if collection is not None:
+        collection.upsert(
+            ids        = ids,
+            documents  = documents,
+            embeddings = embeddings.tolist(),
+            metadatas  = metadatas,
+        )
+
+    _index_upsert(ids, embeddings, metadatas)
+
+    clear_query_cache()
     print(f"Stored {len(ids)} articles in vector store.")
 
 
 # ═══════════════════════════════════════════════
 # FUNCTION 2: get_recommendations
 # Embeds the query and finds TOP_K nearest
-# articles by cosine similarity in ChromaDB
+# articles by cosine similarity in the index
 # ═══════════════════════════════════════════════
 def get_recommendations(query_text: str, top_k: int = TOP_K) -> list[dict[str, Any]]:
     """
@@ -90,41 +546,68 @@ def get_recommendations(query_text: str, top_k: int = TOP_K) -> list[dict[str, A
     Returns list of dicts with title, url, source, score.
     Score closer to 1.0 = more similar.
     """
-    if collection.count() == 0:
+    get_collection()   # persisted rows must be indexed before searching
+
+    # Generation first: a store landing after this makes _cache_put a no-op
+    generation         = cache_generation()
+    E, scales, meta, _ = _index_snapshot()
+    k = min(top_k, len(meta))
+    if k <= 0:
         return []
 
-    query_embedding = model.encode([query_text]).tolist()
+    key    = (query_text, top_k)
+    cached = _cache_get_exact(key)
+    if cached is not None:
+        return cached
 
-    results = collection.query(
-        query_embeddings = query_embedding,
-        n_results        = min(top_k, collection.count()),
-    )
+    query_embedding = get_model().encode([query_text])[0]
 
-    recommendations: list[dict[str, Any]] = []
+    similar = _cache_get_similar(query_embedding, top_k)
+    if similar is not None:
+        # Alias this text to the matched entry under that entry's own
+        # embedding, so hits can't chain past CACHE_THRESHOLD (B≈A, C≈B)
+        matched_embedding, cached = similar
+        _cache_put(key, matched_embedding, cached, generation)
+        return cached
 
-    # Mypy requires us to prove these aren't None before indexing into them
-    res_metadatas = results.get("metadatas")
-    res_distances = results.get("distances")
+    top, scores = _top_k(E, scales, query_embedding, k)
 
-    if res_metadatas is None or res_distances is None:
-        return recommendations
+    # Round all scores in one numpy call; Python only builds the dicts
+    recommendations: list[dict[str, Any]] = [
+        {
+            "title":  meta[row].get("title", "Unknown"),
+            "url":    meta[row].get("url", ""),
+            "source": meta[row].get("source", "Unknown"),
+            "score":  score,
+        }
+        for row, score in zip(top.tolist(), np.round(scores, 3).tolist())
+    ]
 
-    if not res_metadatas or not res_distances:
-        return recommendations
+    _cache_put(key, query_embedding, recommendations, generation)
+    return recommendations
 
-    for i, metadata in enumerate(res_metadatas[0]):
-        # Ensure metadata is not None (ChromaDB typing edge case)
-        if metadata is None:
-            continue
 
-        recommendations.append({
-            "title":  metadata.get("title", "Unknown"),
-            "url":    metadata.get("url", ""),
-            "source": metadata.get("source", "Unknown"),
-            "score":  round(1 - res_distances[0][i], 3),
-        })
+# ═══════════════════════════════════════════════
+# FUNCTION 3: search_articles
+# Same search as get_recommendations, minus the
+# per-result dicts — for callers asking for
+# hundreds or thousands of matches
+# ═══════════════════════════════════════════════
+def search_articles(query_text: str, top_k: int = TOP_K) -> tuple[list[str], np.ndarray]:
+    """
+    Find the top_k articles most similar to query_text.
+    Returns (article ids, float32 scores), best first;
+    ids match article_id(). Not cached.
+    """
+    get_collection()   # persisted rows must be indexed before searching
 
-    return recommendations
+    E, scales, _, ids = _index_snapshot()
+    k = min(top_k, len(ids))
+    if k <= 0:
+        return [], np.empty(0, dtype=np.float32)
+
+    top, scores = _top_k(E, scales, get_model().encode([query_text])[0], k)
+    return [ids[row] for row in top.tolist()], scores
 
 
 # ── DEMO ──────────────────────────────────────
@@ -5,8 +5,15 @@ so API keys never reach the browser.
 """
 
 import os
+import time
+import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import requests
-from flask import Flask, jsonify, request
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, Response, request, stream_with_context
 from flask_cors import CORS
 from flask_caching import Cache
 from dotenv import load_dotenv
@@ -17,7 +24,46 @@ app = Flask(__name__, static_folder='.', static_url_path='')
 CORS(app)
 
 # ── Configure Cache ───────────────────────────
-cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 900})
+# SimpleCache is per-process; set CACHE_TYPE=RedisCache (+ CACHE_REDIS_URL)
+# in production so cached summaries survive restarts and are shared
+cache_config = {
+    'CACHE_TYPE':            os.getenv('CACHE_TYPE', 'SimpleCache'),
+    'CACHE_DEFAULT_TIMEOUT': 900,
+}
+if os.getenv('CACHE_REDIS_URL'):
+    cache_config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL')
+cache = Cache(app, config=cache_config)
+
+SUMMARY_CACHE_TIMEOUT = 86400  # summaries of the same article never change
+
+# ── Batch summarization limits ────────────────
+MAX_BATCH_SIZE     = 20    # articles accepted per /api/summarize_batch call
+# Per worker process, shared by all requests that worker serves.
+# Total concurrency is this × Gunicorn workers; 429s beyond that
+# are absorbed by the jittered backoff below
+SUMMARY_WORKERS    = int(os.getenv('GEMINI_CONCURRENCY', 5))
+GEMINI_MAX_RETRIES = 3     # 429 retries per article inside a batch
+GEMINI_BACKOFF     = 0.5   # seconds; doubled each retry, plus jitter
+
+summary_pool = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS)
+
+# ── Shared HTTP session ───────────────────────
+# Keep-alive pool reused for NewsAPI and Gemini calls, so each
+# request skips the TCP + TLS handshake. Retries cover failed
+# connects plus 502/503/504 on GETs (urllib3 never re-sends a POST
+# on status); the last response is returned as-is after that.
+session = requests.Session()
+adapter = HTTPAdapter(
+    pool_connections = 32,
+    pool_maxsize     = 32,
+    max_retries      = Retry(
+        total            = 2,
+        backoff_factor   = 0.2,
+        status_forcelist = [502, 503, 504],
+        raise_on_status  = False,
+    ),
+)
+session.mount('https://', adapter)
 
 NEWS_API_KEY = os.getenv('NEWS_API_KEY')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
@@ -27,6 +73,15 @@ GEMINI_API_URL  = (
     'https://generativelanguage.googleapis.com/v1beta/models/'
     'gemini-2.5-flash:generateContent'
 )
+GEMINI_STREAM_URL = (
+    'https://generativelanguage.googleapis.com/v1beta/models/'
+    'gemini-2.5-flash:streamGenerateContent'
+)
+
+
+def fastjson(obj, status=200):
+    """JSON response serialized by orjson (much faster than jsonify)."""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
 
 
 # ── Serve frontend ────────────────────────────
@@ -50,10 +105,10 @@ def get_news():
     page_size = request.args.get('pageSize', 12)
 
     if not NEWS_API_KEY:
-        return jsonify({'error': 'NEWS_API_KEY not set in .env'}), 500
+        return fastjson({'error': 'NEWS_API_KEY not set in .env'}, 500)
 
     try:
-        response = requests.get(NEWS_API_URL, params={
+        response = session.get(NEWS_API_URL, params={
             'q':        topic,
             'pageSize': page_size,
             'sortBy':   'publishedAt',
@@ -62,23 +117,176 @@ def get_news():
         }, timeout=10)
 
         if response.status_code == 401:
-            return jsonify({'error': 'Invalid NewsAPI key'}), 401
+            return fastjson({'error': 'Invalid NewsAPI key'}, 401)
         if response.status_code == 429:
-            return jsonify({'error': 'NewsAPI rate limit reached'}), 429
+            return fastjson({'error': 'NewsAPI rate limit reached'}, 429)
 
-        data = response.json()
-        return jsonify({
+        data = orjson.loads(response.content)
+        resp = fastjson({
             'status':   data.get('status'),
             'articles': data.get('articles', []),
-        }), 200
+        })
+
+        # Validator + browser caching matching the 15-minute server cache;
+        # conditional_get() below turns repeat polls into 304s
+        resp.add_etag(weak=True)
+        resp.headers['Cache-Control'] = 'public, max-age=900'
+        return resp
 
     except requests.exceptions.Timeout:
-        return jsonify({'error': 'NewsAPI request timed out'}), 504
+        return fastjson({'error': 'NewsAPI request timed out'}, 504)
     except requests.exceptions.ConnectionError:
-        return jsonify({'error': 'Could not reach NewsAPI'}), 503
+        return fastjson({'error': 'Could not reach NewsAPI'}, 503)
+
+
+# ── Conditional GET (ETag → 304) ──────────────
+@app.after_request
+def conditional_get(response):
+    """
+    Answer a matching If-None-Match with 304 Not Modified.
+    Runs after Flask-Caching too, so cached hits are covered.
+    """
+    if request.path.startswith('/api/') and response.status_code == 200 and 'ETag' in response.headers:
+        response.make_conditional(request)
+    return response
 
 
 # ── Gemini summarization proxy ────────────────
+FALLBACK_SUMMARY = 'Could not generate summary.'
+
+
+def summary_cache_key(title, description, url):
+    """Deterministic cache key for an article's summary."""
+    digest = hashlib.sha256(f"{title}|{description}|{url}".encode()).hexdigest()
+    return f"summary:{digest}"
+
+
+def cache_summary(cache_key, payload, status):
+    """Cache a successful summary — never errors or the fallback text."""
+    if status == 200 and payload.get('summary') != FALLBACK_SUMMARY:
+        cache.set(cache_key, payload['summary'], timeout=SUMMARY_CACHE_TIMEOUT)
+
+
+def gemini_request_body(title, description, url):
+    """Gemini request JSON (prompt + settings) for one article."""
+    # Engineered prompt — controls tone, length, format
+    prompt = (
+        f"Summarize the following news article in exactly one clear, "
+        f"concise paragraph of 3-4 sentences. Focus on the key facts. "
+        f"Do not include opinions or filler phrases like 'This article discusses'.\n\n"
+        f"Title: {title}\n"
+        f"Description: {description}\n"
+        f"Source URL: {url}"
+    )
+
+    return {
+        'contents': [{
+            'parts': [{'text': prompt}]
+        }],
+        # Lower safety thresholds for news topics to prevent empty responses
+        'safetySettings': [
+            {'category': 'HARM_CATEGORY_HARASSMENT',        'threshold': 'BLOCK_NONE'},
+            {'category': 'HARM_CATEGORY_HATE_SPEECH',       'threshold': 'BLOCK_NONE'},
+            {'category': 'HARM_CATEGORY_SEXUALLY_EXPLICIT', 'threshold': 'BLOCK_NONE'},
+            {'category': 'HARM_CATEGORY_DANGEROUS_CONTENT', 'threshold': 'BLOCK_NONE'}
+        ],
+        'generationConfig': {
+            'temperature':     0.3,   # low = more factual, less creative
+            'maxOutputTokens': 200,   # keeps summary concise
+        }
+    }
+
+
+def gemini_error(status_code):
+    """Map a failed Gemini status code to (payload, status), else None."""
+    # Error handling including the new 404 check
+    if status_code == 400:
+        return {'error': 'Bad request to Gemini API'}, 400
+    if status_code == 403:
+        return {'error': 'Invalid Gemini API key'}, 403
+    if status_code == 404:
+        return {'error': 'Gemini model not found. Check the model name in server.py.'}, 404
+    if status_code == 429:
+        return {'error': 'Gemini rate limit reached. Try again shortly.'}, 429
+    if status_code >= 400:
+        return {'error': f'Gemini API error ({status_code}). Try again shortly.'}, 502
+    return None
+
+
+def candidate_text(candidate):
+    """
+    Text of one Gemini candidate: '' when it carries no
+    text, None when its shape is malformed (null content,
+    empty or non-dict parts, non-string text).
+    """
+    if not isinstance(candidate, dict):
+        return None
+
+    content = candidate.get('content') or {}
+    if not isinstance(content, dict):
+        return None
+
+    parts = content.get('parts') or [{}]
+    if not isinstance(parts, list) or not isinstance(parts[0], dict):
+        return None
+
+    text = parts[0].get('text') or ''
+    return text if isinstance(text, str) else None
+
+
+def request_summary(title, description, url, retries=0):
+    """
+    Call Gemini for one article and return (payload, status).
+    Payload is {'summary': ...} or {'error': ...}.
+    Plain dicts (no Flask objects) so it can run in worker
+    threads; 429s are retried `retries` times with jittered
+    exponential backoff.
+    """
+    try:
+        for attempt in range(retries + 1):
+            response = session.post(
+                GEMINI_API_URL,
+                params  = {'key': GEMINI_API_KEY},
+                json    = gemini_request_body(title, description, url),
+                timeout = 15
+            )
+
+            if response.status_code != 429 or attempt == retries:
+                break
+            time.sleep(GEMINI_BACKOFF * 2 ** attempt + random.uniform(0, GEMINI_BACKOFF))
+
+        error = gemini_error(response.status_code)
+        if error:
+            return error
+
+        data = orjson.loads(response.content)
+        if not isinstance(data, dict):
+            return {'error': 'Invalid response from Gemini API'}, 502
+
+        # SAFELY EXTRACT SUMMARY
+        candidates = data.get('candidates') or []
+        if not isinstance(candidates, list):
+            return {'error': 'Invalid response from Gemini API'}, 502
+
+        # If Gemini returns an empty array (often due to safety blocks)
+        if not candidates:
+            return {'error': 'Summary blocked by AI safety filters or unavailable.'}, 400
+
+        text = candidate_text(candidates[0])
+        if text is None:
+            return {'error': 'Invalid response from Gemini API'}, 502
+
+        return {'summary': text.strip() or FALLBACK_SUMMARY}, 200
+
+    except requests.exceptions.Timeout:
+        return {'error': 'Gemini request timed out'}, 504
+    except requests.exceptions.ConnectionError:
+        return {'error': 'Could not reach Gemini API'}, 503
+    except ValueError:
+        # Non-JSON body (e.g. an HTML error page) — fail this article only
+        return {'error': 'Invalid response from Gemini API'}, 502
+
+
 @app.route('/api/summarize', methods=['POST'])
 def summarize():
     """
@@ -89,7 +297,7 @@ def summarize():
     Key never reaches the browser.
     """
     if not GEMINI_API_KEY:
-        return jsonify({'error': 'GEMINI_API_KEY not set in .env'}), 500
+        return fastjson({'error': 'GEMINI_API_KEY not set in .env'}, 500)
 
     # Parse JSON safely (fallback to empty dict if body is missing)
     body        = request.get_json() or {}
@@ -98,82 +306,175 @@ def summarize():
     url         = body.get('url', '')
 
     if not title:
-        return jsonify({'error': 'Article title is required'}), 400
+        return fastjson({'error': 'Article title is required'}, 400)
 
-    # Engineered prompt — controls tone, length, format
-    prompt = (
-        f"Summarize the following news article in exactly one clear, "
-        f"concise paragraph of 3-4 sentences. Focus on the key facts. "
-        f"Do not include opinions or filler phrases like 'This article discusses'.\n\n"
-        f"Title: {title}\n"
-        f"Description: {description}\n"
-        f"Source URL: {url}"
-    )
+    # Same article → same summary: skip the Gemini round-trip entirely
+    cache_key = summary_cache_key(title, description, url)
+    cached    = cache.get(cache_key)
+    if cached is not None:
+        return fastjson({'summary': cached}, 200)
+
+    payload, status = request_summary(title, description, url)
+    cache_summary(cache_key, payload, status)
+    return fastjson(payload, status)
+
+
+@app.route('/api/summarize_batch', methods=['POST'])
+def summarize_batch():
+    """
+    Summarize several articles in one call.
+    Body: {"articles": [{title, description, url}, ...]}.
+    Cache misses fan out to Gemini concurrently (at most
+    SUMMARY_WORKERS per process); results come back in input
+    order, each either {'summary': ...} or {'error': ...}.
+    """
+    if not GEMINI_API_KEY:
+        return fastjson({'error': 'GEMINI_API_KEY not set in .env'}, 500)
+
+    body     = request.get_json() or {}
+    articles = body.get('articles')
+
+    if not isinstance(articles, list) or not articles:
+        return fastjson({'error': 'A non-empty articles list is required'}, 400)
+    if len(articles) > MAX_BATCH_SIZE:
+        return fastjson({'error': f'At most {MAX_BATCH_SIZE} articles per batch'}, 400)
+
+    results = [None] * len(articles)
+    pending = {}   # cache_key → (title, description, url, [result indexes])
+
+    for i, article in enumerate(articles):
+        article     = article if isinstance(article, dict) else {}
+        title       = article.get('title', '')
+        description = article.get('description', '')
+        url         = article.get('url', '')
+
+        if not title:
+            results[i] = {'error': 'Article title is required'}
+            continue
+
+        cache_key = summary_cache_key(title, description, url)
+        cached    = cache.get(cache_key)
+        if cached is not None:
+            results[i] = {'summary': cached}
+        elif cache_key in pending:
+            pending[cache_key][3].append(i)   # duplicate in this batch
+        else:
+            pending[cache_key] = (title, description, url, [i])
+
+    def run_job(job):
+        title, description, url, _ = job
+        return request_summary(title, description, url, retries=GEMINI_MAX_RETRIES)
+
+    # map() yields in submission order, so outcomes line up with pending
+    outcomes = summary_pool.map(run_job, pending.values())
+
+    for (cache_key, (_, _, _, indexes)), (payload, status) in zip(pending.items(), outcomes):
+        cache_summary(cache_key, payload, status)
+        for i in indexes:
+            results[i] = payload
+
+    return fastjson({'results': results}, 200)
+
+
+def sse_event(payload):
+    """Format one Server-Sent Events message carrying JSON."""
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+
+@app.route('/api/summarize/stream')
+def summarize_stream():
+    """
+    Streaming variant of /api/summarize for EventSource.
+    Query params: title, description, url. Emits
+    {'delta': text} events as Gemini generates, then
+    {'done': true} — or a single {'error': ...} event,
+    since EventSource cannot read error response bodies.
+    """
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+    def single_event(payload):
+        events = sse_event(payload)
+        if 'error' not in payload:
+            events += sse_event({'done': True})
+        return Response(events, mimetype='text/event-stream', headers=headers)
+
+    if not GEMINI_API_KEY:
+        return single_event({'error': 'GEMINI_API_KEY not set in .env'})
+
+    title       = request.args.get('title', '')
+    description = request.args.get('description', '')
+    url         = request.args.get('url', '')
+
+    if not title:
+        return single_event({'error': 'Article title is required'})
+
+    cache_key = summary_cache_key(title, description, url)
+    cached    = cache.get(cache_key)
+    if cached is not None:
+        return single_event({'delta': cached})
 
     try:
-        response = requests.post(
-            GEMINI_API_URL,
-            params  = {'key': GEMINI_API_KEY},
-            json    = {
-                'contents': [{
-                    'parts': [{'text': prompt}]
-                }],
-                # Lower safety thresholds for news topics to prevent empty responses
-                'safetySettings': [
-                    {'category': 'HARM_CATEGORY_HARASSMENT',        'threshold': 'BLOCK_NONE'},
-                    {'category': 'HARM_CATEGORY_HATE_SPEECH',       'threshold': 'BLOCK_NONE'},
-                    {'category': 'HARM_CATEGORY_SEXUALLY_EXPLICIT', 'threshold': 'BLOCK_NONE'},
-                    {'category': 'HARM_CATEGORY_DANGEROUS_CONTENT', 'threshold': 'BLOCK_NONE'}
-                ],
-                'generationConfig': {
-                    'temperature':     0.3,   # low = more factual, less creative
-                    'maxOutputTokens': 200,   # keeps summary concise
-                }
-            },
+        response = session.post(
+            GEMINI_STREAM_URL,
+            params  = {'key': GEMINI_API_KEY, 'alt': 'sse'},
+            json    = gemini_request_body(title, description, url),
+            stream  = True,
             timeout = 15
         )
+    except requests.exceptions.Timeout:
+        return single_event({'error': 'Gemini request timed out'})
+    except requests.exceptions.ConnectionError:
+        return single_event({'error': 'Could not reach Gemini API'})
 
-        # Error handling including the new 404 check
-        if response.status_code == 400:
-            return jsonify({'error': 'Bad request to Gemini API'}), 400
-        if response.status_code == 403:
-            return jsonify({'error': 'Invalid Gemini API key'}), 403
-        if response.status_code == 404:
-            return jsonify({'error': 'Gemini model not found. Check the model name in server.py.'}), 404
-        if response.status_code == 429:
-            return jsonify({'error': 'Gemini rate limit reached. Try again shortly.'}), 429
+    error = gemini_error(response.status_code)
+    if error:
+        response.close()
+        return single_event(error[0])
 
-        data = response.json()
+    def generate():
+        parts = []
+        try:
+            # Raw bytes: requests would decode text/event-stream as
+            # ISO-8859-1 (no charset given); orjson reads UTF-8 directly
+            for line in response.iter_lines():
+                if not line or not line.startswith(b'data:'):
+                    continue
 
-        # SAFELY EXTRACT SUMMARY
-        candidates = data.get('candidates', [])
-        
-        # If Gemini returns an empty array (often due to safety blocks)
-        if not candidates:
-            return jsonify({'error': 'Summary blocked by AI safety filters or unavailable.'}), 400
-
-        # Now we know candidates[0] is safe to access
-        summary = (
-            candidates[0]
-            .get('content', {})
-            .get('parts', [{}])[0]
-            .get('text', 'Could not generate summary.')
-        )
+                chunk      = orjson.loads(line[len(b'data:'):])
+                candidates = (chunk.get('candidates') or [{}]) if isinstance(chunk, dict) else None
+                text       = candidate_text(candidates[0]) if isinstance(candidates, list) else None
 
-        return jsonify({'summary': summary.strip()}), 200
+                if text is None:
+                    yield sse_event({'error': 'Invalid response from Gemini API'})
+                    return
 
-    except requests.exceptions.Timeout:
-        return jsonify({'error': 'Gemini request timed out'}), 504
-    except requests.exceptions.ConnectionError:
-        return jsonify({'error': 'Could not reach Gemini API'}), 503
+                if text:
+                    parts.append(text)
+                    yield sse_event({'delta': text})
+        except (requests.exceptions.RequestException, ValueError):
+            yield sse_event({'error': 'Gemini stream was interrupted'})
+            return
+        finally:
+            response.close()
+
+        summary = ''.join(parts).strip()
+        if not summary:
+            yield sse_event({'error': 'Summary blocked by AI safety filters or unavailable.'})
+            return
+
+        cache.set(cache_key, summary, timeout=SUMMARY_CACHE_TIMEOUT)
+        yield sse_event({'done': True})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
 
 
 # ── Health check ──────────────────────────────
 @app.route('/api/health')
 def health():
     """Simple health check endpoint."""
-    return jsonify({'status': 'ok'}), 200
+    return fastjson({'status': 'ok'}, 200)
 
 
+# Dev server only — production runs `gunicorn server:app` (gunicorn.conf.py)
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file